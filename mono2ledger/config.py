@@ -8,6 +8,7 @@ from pydantic import (
     BaseModel,
     Field,
     FilePath,
+    PrivateAttr,
     RootModel,
     field_validator,
     model_validator,
@@ -68,12 +69,16 @@ class MatcherValue(BaseModel):
     source_ledger_account_suffix: str = ""
 
 
+# Shared starting value for matching, never modified since merges build new values
+EMPTY_MATCHER_VALUE = MatcherValue()
+
 MatcherPredicateResult = namedtuple("MatcherPredicateResult", ["field", "result"])
 
 
 class MatcherPredicate(BaseModel):
     mcc: list[int] = []
-    description: Optional[str] = None
+    # Compiled once when config is loaded instead of on every match
+    description: Optional[re.Pattern] = None
 
     def matches(self, statement: "StatementItem") -> Iterator[MatcherPredicateResult]:
         defined_fields = self.model_fields_set
@@ -83,8 +88,8 @@ class MatcherPredicate(BaseModel):
             yield MatcherPredicateResult(
                 field="description",
                 result=(
-                    self.description
-                    and re.match(self.description, statement.description)
+                    self.description is not None
+                    and self.description.match(statement.description) is not None
                 ),
             )
 
@@ -92,11 +97,12 @@ class MatcherPredicate(BaseModel):
 class Matcher(BaseModel):
     value: MatcherValue = MatcherValue()
     predicate: MatcherPredicate
-    submatchers: "MatchersModel" = []
+    submatchers: "MatchersModel" = Field(default_factory=lambda: MatchersModel())
 
 
 class MatchersModel(RootModel):
     root: list[Matcher] = []
+    _by_mcc: dict[int, list[Matcher]] = PrivateAttr(default_factory=dict)
 
     def __iter__(self):
         return iter(self.root)
@@ -104,11 +110,28 @@ class MatchersModel(RootModel):
     def __getitem__(self, item):
         return self.root[item]
 
+    def __len__(self):
+        return len(self.root)
+
+    def for_mcc(self, mcc: int) -> list[Matcher]:
+        """Return matchers in config order which may match statement with this mcc"""
+        if mcc not in self._by_mcc:
+            self._by_mcc[mcc] = [
+                matcher
+                for matcher in self.root
+                if "mcc" not in matcher.predicate.model_fields_set
+                or mcc in matcher.predicate.mcc
+            ]
+        return self._by_mcc[mcc]
+
 
 class ConfigModel(BaseModel):
     settings: SettingsModel = Field(default_factory=lambda: SettingsModel())
     accounts: AccountsModel = Field(default_factory=lambda: AccountsModel())
     matchers: MatchersModel = Field(default_factory=lambda: MatchersModel())
+    _match_cache: dict[tuple[int, str], MatcherValue] = PrivateAttr(
+        default_factory=dict
+    )
 
     def match_account(self, account_id: str, default=None) -> Account:
         """Return matching ledger account name for provided account id or default"""
@@ -134,10 +157,10 @@ class ConfigModel(BaseModel):
     def _match_statement(
         self,
         statement: "StatementItem",
-        matchers: list[Matcher],
+        matchers: MatchersModel,
         _current_value: dict | MatcherValue,
     ) -> MatcherValue:
-        for matcher in matchers:
+        for matcher in matchers.for_mcc(statement.mcc):
             if all(x.result for x in matcher.predicate.matches(statement)):
                 current_value = self._merge_values(_current_value, matcher.value)
                 if matcher.submatchers:
@@ -163,6 +186,13 @@ class ConfigModel(BaseModel):
         Default matcher value will be provided values from which will be returned when
         no matcher is found with values to override provided ones.
         """
-        return self._match_statement(
-            statement, self.matchers, default_value if default_value else MatcherValue()
-        )
+        if default_value:
+            return self._match_statement(statement, self.matchers, default_value)
+        # Predicates only look at mcc and description so statements sharing them
+        # always resolve to the same value
+        key = (statement.mcc, statement.description)
+        if key not in self._match_cache:
+            self._match_cache[key] = self._match_statement(
+                statement, self.matchers, EMPTY_MATCHER_VALUE
+            )
+        return self._match_cache[key]
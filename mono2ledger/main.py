@@ -3,14 +3,18 @@ import io
 import itertools
 import json
 import logging
+import mmap
 import os
 import re
 import shlex
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import cache
+from operator import attrgetter
 from pathlib import Path
 from typing import Iterator, Optional, TextIO
 from urllib.error import HTTPError
@@ -18,12 +22,44 @@ from urllib.parse import urljoin
 from urllib.request import Request, urlopen
 
 import yaml
-from dateutil.relativedelta import relativedelta
 from pycountry import currencies
 
 from mono2ledger.config import ConfigModel, MatcherValue
 
-Currency = currencies.get(alpha_3="UAH").__class__
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+LEDGER_DATE_RE = re.compile(rb"\d{4}[/|-]\d{2}[/|-]\d{2}")
+# Characters starting a comment line in ledger file
+LEDGER_COMMENT_CHARS = (b";", b"#", b"*")
+# Card type or account currency mono mentions in descriptions of transfers between
+# own cards
+CROSS_CARD_RE = re.compile(r"(чорн|біл)(у|ої)|(гривне|євро|долар)(вий|вого)")
+
+DATE_FORMAT_SEPARATORS = {"%Y/%m/%d": "/", "%Y-%m-%d": "-"}
+
+# Seconds monobank API requires between requests for statements of an account
+STATEMENT_REQUEST_INTERVAL = 60
+# Statements of periods that ended earlier than this ago are cached
+STATEMENT_CACHE_DELAY = timedelta(days=1)
+# Longest period statements can be requested for at once is 31 days and 1 hour
+STATEMENT_MAX_PERIOD = timedelta(days=31)
+
+TRANSACTION_TEMPLATE = (
+    "{date} {payee}\n"
+    "\t{to_account:60} {amount} {currency} {exchange}\n"
+    "\t{from_account}"
+)
+CASHBACK_TEMPLATE = (
+    "{date} {payee}\n\t{to_account:60} {amount} {currency}\n\t{from_account}"
+)
 
 
 @cache
@@ -32,9 +68,9 @@ def get_config() -> ConfigModel:
     config_file = Path(config_dir, "mono2ledger/config.yaml").expanduser()
     if not config_file.exists():
         logging.error("Config file for mono2ledger does not exist")
-        exit(1)
+        sys.exit(1)
     with config_file.open("rb") as file:
-        return ConfigModel.model_validate(yaml.load(file, Loader=yaml.Loader))
+        return ConfigModel.model_validate(yaml.load(file, Loader=YamlLoader))
 
 
 @cache
@@ -47,37 +83,48 @@ def get_api_key() -> str:
         stdout, stderr = proc.communicate()
         if proc.returncode != 0:
             logging.error("Could not retrieve API key using provided command.")
-            exit(1)
+            sys.exit(1)
         return stdout.decode().split("\n")[0]
 
 
+@cache
+def snake_to_camel_case(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(x.capitalize() for x in rest)
+
+
 class JSONObject:
+    __slots__ = ("json",)
     json: dict
+    # Frequently accessed fields which are copied from JSON into slots so reading
+    # them does not go through __getattr__
+    fields: tuple[str, ...] = ()
 
     def __init__(self, json_data: str | dict | TextIO, **kwargs):
         if isinstance(json_data, dict):
             self.json = json_data
         elif isinstance(json_data, io.IOBase):
-            self.json = json.load(json_data)
+            self.json = json_loads(json_data.read())
         else:
-            self.json = json.loads(json_data)
+            self.json = json_loads(json_data)
 
         self.json |= kwargs
+        for field in self.fields:
+            if (key := snake_to_camel_case(field)) in self.json:
+                setattr(self, field, self.json[key])
 
     def __getattr__(self, item: str):
         if "_" in item:
-            items = item.split("_")
-            items = [items[0]] + [x.capitalize() for x in items[1:]]
             try:
-                return self.json["".join(items)]
+                return self.json[snake_to_camel_case(item)]
             except KeyError:
                 raise AttributeError
         return self.json[item]
 
     def get(self, item, default=None):
         try:
-            return self.__getattr__(item)
-        except KeyError:
+            return getattr(self, item)
+        except (KeyError, AttributeError):
             return default
 
     def __repr__(self):
@@ -85,49 +132,91 @@ class JSONObject:
 
 
 class Account(JSONObject):
-    pass
+    fields = ("id", "iban", "currency_code", "cashback_type")
+    __slots__ = fields
 
 
 class StatementItem(JSONObject):
-    account = None
+    fields = (
+        "id",
+        "time",
+        "description",
+        "mcc",
+        "amount",
+        "operation_amount",
+        "currency_code",
+        "cashback_amount",
+    )
+    __slots__ = ("account", *fields)
 
     def __init__(self, json_data, account=None, **kwargs):
         self.account = account
         super().__init__(json_data, **kwargs)
 
 
+def find_last_line(data: mmap.mmap, line: bytes, end: int) -> int:
+    """Return offset of the last line equal to line that ends before end or -1"""
+    result = -1
+    # Ledger may use either LF or CRLF line endings
+    for full_line in (line + b"\n", line + b"\r\n"):
+        if (index := data.rfind(b"\n" + full_line, 0, end)) != -1:
+            result = max(result, index + 1)
+        elif len(full_line) <= end and data[: len(full_line)] == full_line:
+            result = max(result, 0)
+    return result
+
+
+def parse_date(value: str, date_format: str) -> datetime:
+    """Return date parsed from value with strptime date_format"""
+    # Common ledger formats are parsed directly to skip strptime format parsing
+    separator = DATE_FORMAT_SEPARATORS.get(date_format)
+    if separator and len(value) == 10 and value[4] == value[7] == separator:
+        return datetime(int(value[:4]), int(value[5:7]), int(value[8:]))
+    return datetime.strptime(value, date_format)
+
+
 def get_last_transaction_date(file_path: str, default=None) -> datetime:
     """
     Return date of the last ledger transaction in file.
+
+    File is scanned backwards from its end and stops at the first dated line that
+    is not commented out. Looking for the comment directive preceding that line
+    still searches back to the start of file when there is none, so the whole
+    file is usually read, but by mmap.rfind instead of a Python loop over lines.
     """
-    pattern = re.compile(r"\d{4}[/|-]\d{2}[/|-]\d{2}")
-    comment_pattern = re.compile(r"^\s*[;#*]+")
-    inside_comment = False
     result = None
-    with open(file_path, "r") as file:
-        for line in file.readlines():
-            # Exclude hledger multi-line comments
-            if not inside_comment and line == "comment\n":
-                inside_comment = True
-            elif inside_comment and line == "end comment\n":
-                inside_comment = False
-            if (
-                not inside_comment
-                and not comment_pattern.match(line)
-                and (match := pattern.findall(line))
-            ):
-                result = match[0]
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return default
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = len(data)
+            while end > 0:
+                start = data.rfind(b"\n", 0, end - 1) + 1
+                line = data[start:end]
+                end = start
+                if line.lstrip()[:1] in LEDGER_COMMENT_CHARS or not (
+                    match := LEDGER_DATE_RE.search(line)
+                ):
+                    continue
+                # Exclude hledger multi-line comments. Line is inside of one when
+                # the last comment directive before it opens a block.
+                comment_start = find_last_line(data, b"comment", start)
+                if comment_start > find_last_line(data, b"end comment", start):
+                    end = comment_start
+                    continue
+                result = match[0].decode()
+                break
 
     if result:
         date_format = get_config().settings.ledger_date_format
         try:
-            return datetime.strptime(result, date_format)
+            return parse_date(result, date_format)
         except ValueError:
             logging.error(
                 "Could not match date in ledger file using format set in config. "
-                "Date is {result}, format is {date_format}"
+                f"Date is {result}, format is {date_format}"
             )
-            exit(1)
+            sys.exit(1)
     return default
 
 
@@ -135,109 +224,238 @@ def fetch(endpoint: str) -> dict:
     url = urljoin("https://api.monobank.ua", endpoint)
     request = Request(url, headers={"X-Token": get_api_key()})
     response = urlopen(request)
-    return json.load(response.fp)
+    return json_loads(response.read())
 
 
 def fetch_accounts() -> list[Account]:
     response = fetch("/personal/client-info")
     logging.debug(f"Fetched accounts with response {response}")
+    ignored_accounts = frozenset(get_config().settings.ignored_accounts)
     return [
         Account(account)
         for account in response["accounts"]
-        if account["id"] not in get_config().settings.ignored_accounts
+        if account["id"] not in ignored_accounts
     ]
 
 
 def date_range(
-    start: datetime, end: datetime, interval: timedelta | relativedelta
+    start: datetime, end: datetime, interval: timedelta
 ) -> Iterator[tuple[datetime, datetime]]:
-    delta = end - start
-    if delta.days > 30:
-        yield from date_range(start, end - interval, interval)
-    yield end - delta, end
-
+    """Yield consecutive periods no longer than interval covering start to end"""
+    # API bounds are inclusive and passed with second precision so each period
+    # starts a second after the previous one ends to not fetch its last second twice
+    start = start.replace(microsecond=0)
+    end = end.replace(microsecond=0)
+    while start <= end:
+        period_end = min(start + interval, end)
+        yield start, period_end
+        start = period_end + timedelta(seconds=1)
+
+
+def get_statement_cache_file(
+    account: Account, from_time: datetime, to_time: datetime
+) -> Optional[Path]:
+    """
+    Return path to file caching API response with statements of account for interval
+    or None if response for this interval should not be cached.
 
-def fetch_statements(
-    accounts: list[Account], from_time: datetime, to_time: datetime
+    Only intervals that ended more than STATEMENT_CACHE_DELAY ago are cached because
+    statements for them are no longer expected to change, e.g. by holds settling.
+    """
+    if to_time > datetime.now() - STATEMENT_CACHE_DELAY:
+        return None
+    cache_dir = os.getenv("XDG_CACHE_HOME", "~/.cache")
+    return Path(
+        cache_dir,
+        "mono2ledger/statements",
+        account.id,
+        f"{int(from_time.timestamp())}-{int(to_time.timestamp())}.json",
+    ).expanduser()
+
+
+def fetch_account_statements(
+    account: Account,
+    from_time: datetime,
+    to_time: datetime,
+    stop: threading.Event,
+    use_cache: bool = True,
 ) -> list[StatementItem]:
-    intervals = date_range(from_time, to_time, relativedelta(months=1))
-    combinations = list(itertools.product(accounts, intervals))
-    for account, interval in combinations:
-        _from_time, _to_time = interval
-        try:
-            response = fetch(
-                "/personal/statement"
-                f"/{account.id}"
-                f"/{int(_from_time.timestamp())}"
-                f"/{int(_to_time.timestamp())}"
-            )
-        except HTTPError as e:
-            if e.code == 429:
+    """
+    Return statements of single account, waiting between requests to obey API rate
+    limit. Returns early with what was fetched so far when stop is set.
+    """
+    next_request_time = time.monotonic()
+
+    def fetch_response(_from_time: datetime, _to_time: datetime) -> Optional[list]:
+        nonlocal next_request_time
+        while True:
+            if delay := max(0, next_request_time - time.monotonic()):
                 logging.info(
-                    "Encountered rate limit while fetching statement for account"
-                    f" {account} from {from_time.isoformat()} to {to_time.isoformat()}."
-                    " Retrying after 60 seconds"
+                    f"Waiting {delay:.0f} seconds before fetching statements for"
+                    f" account {account.id} to obey API rate limit."
                 )
-                time.sleep(60)
-                yield from fetch_statements(accounts, from_time, to_time)
-            else:
-                logging.error(
-                    "Got unexpected response when fetching statement for account "
-                    f"{account}. Response has status code {e.code} with content "
-                    f"{e.read().decode()}"
+            if stop.wait(delay):
+                return None
+            next_request_time = time.monotonic() + STATEMENT_REQUEST_INTERVAL
+            try:
+                return fetch(
+                    "/personal/statement"
+                    f"/{account.id}"
+                    f"/{int(_from_time.timestamp())}"
+                    f"/{int(_to_time.timestamp())}"
                 )
-                exit(1)
-        logging.debug(
-            f"Fetched statement for account {account} with response {response}"
-        )
-        logging.info(
-            f"Fetched statements for account {account.id}"
-            f" from {_from_time.date().isoformat()} to {_to_time.date().isoformat()}."
-            " Waiting 60 seconds before fetching another statement"
-            " to obey API rate limit."
+            except HTTPError as e:
+                if e.code == 429:
+                    logging.info(
+                        "Encountered rate limit while fetching statement for account"
+                        f" {account} from {_from_time.isoformat()}"
+                        f" to {_to_time.isoformat()}. Retrying."
+                    )
+                else:
+                    logging.error(
+                        "Got unexpected response when fetching statement for account "
+                        f"{account}. Response has status code {e.code} with content "
+                        f"{e.read().decode()}"
+                    )
+                    sys.exit(1)
+
+    def fetch_interval(
+        _from_time: datetime, _to_time: datetime
+    ) -> Iterator[StatementItem]:
+        cache_file = (
+            get_statement_cache_file(account, _from_time, _to_time)
+            if use_cache
+            else None
         )
-        time.sleep(60)
+        if cache_file and cache_file.exists():
+            response = json_loads(cache_file.read_bytes())
+            logging.info(
+                f"Using cached statements for account {account.id}"
+                f" from {_from_time.date().isoformat()}"
+                f" to {_to_time.date().isoformat()}."
+                " Use --no-cache to fetch them again."
+            )
+        else:
+            response = fetch_response(_from_time, _to_time)
+            if response is None:
+                return
+            logging.debug(
+                f"Fetched statement for account {account} with response {response}"
+            )
+            logging.info(
+                f"Fetched statements for account {account.id}"
+                f" from {_from_time.date().isoformat()}"
+                f" to {_to_time.date().isoformat()}."
+            )
+            if cache_file:
+                # Write through temporary file so interrupted run does not leave
+                # truncated cache behind
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = cache_file.with_suffix(".tmp")
+                temp_file.write_text(json.dumps(response))
+                temp_file.replace(cache_file)
         if len(response) < 500:
             yield from (StatementItem(x, account=account) for x in response)
         else:
-            # NOTE 2023-07-16: This was never tested but in theory should work as
-            # intended
-            # TODO 2023-07-16: Actually test this with unit test
-            period = timedelta(days=(_from_time - _to_time).days / 2)
-            yield from fetch_statements(accounts, _from_time, _to_time - period)
-            yield from fetch_statements(accounts, _from_time + period, _to_time)
+            # API returns at most 500 statements so interval is split in halves to
+            # get the rest. Second half starts a second later as bounds are
+            # inclusive and passed with second precision.
+            middle = _from_time + (_to_time - _from_time) / 2
+            yield from fetch_interval(_from_time, middle)
+            yield from fetch_interval(middle + timedelta(seconds=1), _to_time)
+
+    return [
+        statement
+        for interval in date_range(from_time, to_time, STATEMENT_MAX_PERIOD)
+        for statement in fetch_interval(*interval)
+    ]
+
+
+def fetch_statements(
+    accounts: list[Account],
+    from_time: datetime,
+    to_time: datetime,
+    use_cache: bool = True,
+) -> list[StatementItem]:
+    # API rate limit applies to each account separately so accounts are fetched
+    # concurrently and total time is bound by account with most requests
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(len(accounts), 1))
+    try:
+        results = executor.map(
+            lambda account: fetch_account_statements(
+                account, from_time, to_time, stop, use_cache
+            ),
+            accounts,
+        )
+        return list(itertools.chain.from_iterable(results))
+    finally:
+        stop.set()
+        executor.shutdown(cancel_futures=True)
+
+
+@cache
+def get_ledger_account(account_id: str) -> str:
+    return get_config().match_account(account_id, f"Assets:Mono2ledger:{account_id}")
 
 
 def get_ledger_account_for_account(account: Account) -> str:
-    return get_config().match_account(account.id, f"Assets:Mono2ledger:{account.id}")
+    return get_ledger_account(account.id)
+
+
+def format_date(date: datetime, date_format: str) -> str:
+    """Return date formatted with strftime date_format"""
+    # Common ledger formats are built directly to skip strftime format parsing
+    if separator := DATE_FORMAT_SEPARATORS.get(date_format):
+        return f"{date.year:04}{separator}{date.month:02}{separator}{date.day:02}"
+    return date.strftime(date_format)
+
+
+@cache
+def get_currency_code(numeric_code: int) -> str:
+    """Return ISO 4217 alphabetic code of currency with provided numeric code"""
+    # Numeric codes are stored zero padded to three digits
+    return currencies.get(numeric=f"{numeric_code:03}").alpha_3
+
+
+def format_decimal_amount(amount: int, pad: bool = True) -> str:
+    """Return amount in minor currency units formatted with two decimal places"""
+    amount = amount / 100
+    return f"{amount:8.2f}" if pad else f"{amount:.2f}"
+
+
+def format_trimmed_amount(amount: int, pad: bool = True) -> str:
+    """Return amount in minor currency units formatted without zero fraction"""
+    amount = amount / 100
+    if amount % 1 == 0:
+        return f"{int(amount):8}" if pad else str(int(amount))
+    return f"{amount:8.2f}" if pad else f"{amount:.2f}"
 
 
 def format_ledger_transaction(
     statement: StatementItem, source_statement: Optional[StatementItem] = None
 ) -> Iterator[str]:
     """Yield ledger transactions for statement that possibly came from source"""
-
-    def format_amount(amount: float, pad: bool = True) -> str:
-        amount = amount / 100
-        if config.settings.trim_leading_zeroes and amount % 1 == 0:
-            return f"{int(amount):8}" if pad else str(int(amount))
-        return f"{amount:8.2f}" if pad else f"{amount:.2f}"
-
     config = get_config()
+    format_amount = (
+        format_trimmed_amount
+        if config.settings.trim_leading_zeroes
+        else format_decimal_amount
+    )
     exchange_amount = None
     exchange_currency = None
     if source_statement:
-        payee = get_config().settings.transfer_payee
+        payee = config.settings.transfer_payee
         to_account = get_ledger_account_for_account(statement.account)
         from_account = get_ledger_account_for_account(source_statement.account)
         amount = statement.amount
         if source_statement.amount != source_statement.operation_amount:
             exchange_amount = source_statement.amount
-            exchange_currency = currencies.get(
-                numeric=str(source_statement.account.currency_code)
-            ).alpha_3
+            exchange_currency = get_currency_code(
+                source_statement.account.currency_code
+            )
     else:
-        match: MatcherValue = get_config().match_statement(statement)
+        match: MatcherValue = config.match_statement(statement)
         payee = match.payee if match.payee else statement.description
         from_account = (
             get_ledger_account_for_account(statement.account)
@@ -251,9 +469,7 @@ def format_ledger_transaction(
         amount = -statement.amount
         if statement.amount != statement.operation_amount:
             exchange_amount = statement.operation_amount
-            exchange_currency = currencies.get(
-                numeric=str(statement.currency_code)
-            ).alpha_3
+            exchange_currency = get_currency_code(statement.currency_code)
 
     if amount < 0:
         to_account, from_account = from_account, to_account
@@ -261,8 +477,8 @@ def format_ledger_transaction(
         if exchange_amount:
             exchange_amount = -exchange_amount
 
-    transaction_date = datetime.fromtimestamp(statement.time).strftime(
-        config.settings.ledger_date_format
+    transaction_date = format_date(
+        datetime.fromtimestamp(statement.time), config.settings.ledger_date_format
     )
 
     exchange = (
@@ -271,44 +487,51 @@ def format_ledger_transaction(
         else ""
     )
 
-    currency = currencies.get(
-        numeric=str(
-            statement.account.currency_code if exchange else statement.currency_code
-        )
-    ).alpha_3
+    currency = get_currency_code(
+        statement.account.currency_code if exchange else statement.currency_code
+    )
 
-    yield (
-        f"{transaction_date} {payee}\n"
-        f"\t{to_account:60} {format_amount(amount)} {currency} {exchange}\n"
-        f"\t{from_account}"
+    yield TRANSACTION_TEMPLATE.format(
+        date=transaction_date,
+        payee=payee,
+        to_account=to_account,
+        amount=format_amount(amount),
+        currency=currency,
+        exchange=exchange,
+        from_account=from_account,
     )
 
     if config.settings.record_cashback and (
         cashback_amount := statement.cashback_amount
     ):
-        cashback_type = statement.account.cashback_type
-        yield (
-            f"{transaction_date} {config.settings.cashback_payee}\n"
-            f"\t{config.settings.cashback_ledger_asset_account:60}"
-            f" {format_amount(cashback_amount)} {cashback_type}\n"
-            f"\t{config.settings.cashback_ledger_income_account}"
+        yield CASHBACK_TEMPLATE.format(
+            date=transaction_date,
+            payee=config.settings.cashback_payee,
+            to_account=config.settings.cashback_ledger_asset_account,
+            amount=format_amount(cashback_amount),
+            currency=statement.account.cashback_type,
+            from_account=config.settings.cashback_ledger_income_account,
         )
 
 
 def setup_logging(debug: bool = False) -> None:
     class Formatter(logging.Formatter):
+        colors = {
+            logging.WARNING: 33,
+            logging.ERROR: 31,
+            logging.FATAL: 31,
+            logging.DEBUG: 36,
+        }
+        # Build formatters once instead of for every logged record
+        formatters = {
+            level: logging.Formatter(f"\033[{color}m%(levelname)s\033[0m: %(message)s")
+            for level, color in colors.items()
+        }
+        formatters[logging.INFO] = logging.Formatter("%(message)s")
+        default_formatter = logging.Formatter("%(levelname)s: %(message)s")
+
         def format(self, record):
-            if record.levelno == logging.INFO:
-                fmt = "%(message)s"
-            else:
-                color = {
-                    logging.WARNING: 33,
-                    logging.ERROR: 31,
-                    logging.FATAL: 31,
-                    logging.DEBUG: 36,
-                }.get(record.levelno)
-                fmt = f"\033[{color}m%(levelname)s\033[0m: %(message)s"
-            formatter = logging.Formatter(fmt)
+            formatter = self.formatters.get(record.levelno, self.default_formatter)
             return formatter.format(record)
 
     handler = logging.StreamHandler(sys.stderr)
@@ -328,13 +551,18 @@ def parse_args():
     parser.add_argument(
         "-D", "--debug", action="store_true", help="enable printing of debugging info"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="fetch statements from API even if they were cached by previous runs",
+    )
     args = parser.parse_args(sys.argv[1:])
     if not args.input:
         logging.error(
             "You need to set location of ledger file in config"
             " or provide it in command line."
         )
-        exit(1)
+        sys.exit(1)
     return args
 
 
@@ -352,54 +580,46 @@ def _main():
     )
 
     accounts = fetch_accounts()
+    account_ibans = frozenset(x.iban for x in accounts)
 
     def is_cross_card_statement(statement: StatementItem) -> bool:
         # 4829 is the MCC mono uses for card transfers
         if statement.mcc != 4829:
             return False
         if counter_iban := statement.get("counter_iban"):
-            return counter_iban in (x.iban for x in accounts)
+            return counter_iban in account_ibans
 
+        # Otherwise guess by card type or currency of account in description
         description = statement.description
-        has_card_type = False
-        has_currency = False
-        if "ФОП" in description or re.match(r".*(чорн|біл)(у|ої).*", description):
-            has_card_type = True
-        if re.match(r".*(гривне|євро|долар)(вий|вого).*", description):
-            has_currency = True
-        return has_card_type or has_currency
+        return "ФОП" in description or bool(CROSS_CARD_RE.search(description))
 
     def create_ledger_entries(statements: list[StatementItem]) -> Iterator[str]:
         """
-        Given list of statements sort them by chronological order from newest to latest
-        and yield ledger entry for each one with taking cross card statements into
-        account by grouping them into single statement.
+        Given list of statements sort them in place by chronological order from newest
+        to latest and yield ledger entry for each one with taking cross card statements
+        into account by grouping them into single statement.
 
         Note that because of ordering before displaying returned value it needs to be
         reversed first.
         """
 
-        def get_next(lst, index):
-            try:
-                return lst[index + 1]
-            except IndexError:
-                return None
-
-        statements = sorted(statements, key=lambda x: (x.time, x.amount), reverse=True)
-        for index, statement in enumerate(statements):
+        statements.sort(key=attrgetter("time", "amount"), reverse=True)
+        index = 0
+        while index < len(statements):
+            statement = statements[index]
+            index += 1
             if is_cross_card_statement(statement):
+                # Following statements mirroring this one belong to the same transfer
+                # and are skipped by advancing index past them
                 current_statement = statement
-                next_statement = get_next(statements, index)
-                while (
-                    next_statement
-                    and current_statement.operation_amount
-                    == -next_statement.operation_amount
+                while index < len(statements) and (
+                    current_statement.operation_amount
+                    == -(next_statement := statements[index]).operation_amount
                     and current_statement.currency_code == next_statement.currency_code
                     and current_statement.mcc == next_statement.mcc
                 ):
                     current_statement = next_statement
-                    del statements[index + 1]
-                    next_statement = get_next(statements, index)
+                    index += 1
 
                 # Yield from reversed because list will get reversed again messing up
                 # order returned by format_ledger_transaction...
@@ -409,22 +629,27 @@ def _main():
             else:
                 yield from reversed(list(format_ledger_transaction(statement)))
 
-    statements = fetch_statements(accounts, last_transaction_date, now)
+    use_cache = not (args.no_cache or os.getenv("MONO2LEDGER_NOCACHE") == "1")
+    statements = fetch_statements(accounts, last_transaction_date, now, use_cache)
     ledger_entries = list(create_ledger_entries(statements))
 
     header_datetime = now.strftime("%Y-%m-%d %H:%M:%S")
-    header = f"\n;; Begin mono2ledger output\n;; Date and time: {header_datetime}\n"
-    footer = "\n;; End mono2ledger output\n"
+    header = f"\n;; Begin mono2ledger output\n;; Date and time: {header_datetime}\n\n"
+    footer = ";; End mono2ledger output\n\n"
 
-    print(header)
-    print("\n\n".join(reversed(ledger_entries)))
-    print(footer)
+    sys.stdout.write(header)
+    if ledger_entries:
+        sys.stdout.writelines(entry + "\n\n" for entry in reversed(ledger_entries))
+    else:
+        # Keep the blank lines printed for an empty list of entries
+        sys.stdout.write("\n\n")
+    sys.stdout.write(footer)
 
 
 def main():
     try:
         _main()
     except KeyboardInterrupt as e:
-        exit("Received interrupt, exiting")
+        sys.exit("Received interrupt, exiting")
         if logging.getLogger().level <= logging.DEBUG:
             raise e
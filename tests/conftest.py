@@ -1,36 +1,63 @@
+import itertools
+import json
 import random
 import tempfile
 from contextlib import contextmanager
-from pathlib import Path
+from functools import cache
 from unittest import mock
 
-import factory
 import pytest
-import yaml
 from faker import Faker
+from mono2ledger.config import ConfigModel
 from mono2ledger.main import Account, StatementItem
-from pytest_factoryboy import register as register_factory
 
 fake = Faker()
+# Bound once so factories skip Faker provider lookup on every call
+fake_date = fake.date
+fake_unix_time = fake.unix_time
+# Own generator so test data does not go through the shared module instance
+rng = random.Random()
+
+
+def pooled(generate, size=1000):
+    # Values are generated on first use and then cycled, so they stay unique
+    # among any size consecutive calls
+    pool = []
+    counter = itertools.count()
+
+    def wrapper():
+        index = next(counter) % size
+        if index == len(pool):
+            pool.append(generate())
+        return pool[index]
+
+    return wrapper
+
+
+# Hashing and IBAN check digits are the slowest part of building test objects
+fake_sha1 = pooled(lambda: fake.sha1(raw_output=False))
+fake_iban = pooled(fake.iban)
+
+
+@cache
+def load_config(config_json: str) -> ConfigModel:
+    # Models are only read by code under test so identical configs can share one
+    return ConfigModel.model_validate(json.loads(config_json))
 
 
 @pytest.fixture
 def config():
     @contextmanager
     def wrapper(config=None):
-        from mono2ledger.main import get_config
-
-        get_config.cache_clear()
-        with tempfile.TemporaryDirectory(prefix="mono2ledger-") as config_dir:
-            with mock.patch(
-                "mono2ledger.main.os.getenv", return_value=config_dir
-            ) as patch:
-                config_file = Path(config_dir, "mono2ledger/config.yaml")
-                config_file.parent.mkdir(parents=True)
-                with config_file.open("w") as file:
-                    file.write(yaml.dump(config))
-                yield patch
-        get_config.cache_clear()
+        from mono2ledger.main import get_ledger_account
+
+        get_ledger_account.cache_clear()
+        with mock.patch(
+            "mono2ledger.main.get_config",
+            return_value=load_config(json.dumps(config or {}, sort_keys=True)),
+        ) as patch:
+            yield patch
+        get_ledger_account.cache_clear()
 
     return wrapper
 
@@ -40,7 +67,7 @@ def ledger_file():
     ledger_file = tempfile.NamedTemporaryFile("w", prefix="mono2ledger-")
 
     def wrapper(last_transaction_date="", extra=""):
-        transaction_date = last_transaction_date or fake.date()
+        transaction_date = last_transaction_date or fake_date()
         transaction = extra + (
             f"\n{transaction_date} Payee\n"
             "\tExpenses:Foo  100 UAH\n"
@@ -69,7 +96,7 @@ def fetcher():
     return wrapper
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def main():
     def wrapper(args=[]):
         import sys
@@ -86,48 +113,53 @@ def main():
     return wrapper
 
 
-def make_account(_):
+def make_account():
     return {
-        "id": fake.sha1(raw_output=False),
+        "id": fake_sha1(),
         "currencyCode": 970,
         "cashbackType": "UAH",
-        "iban": fake.iban(),
+        "iban": fake_iban(),
     }
 
 
-def make_statement(_):
-    mcc = random.randint(1000, 9999)
-    amount = random.randint(int(-1e6), int(1e6))
+def make_statement():
+    # All random fields are taken from a single draw
+    bits = rng.getrandbits(64)
+    mcc = 1000 + (bits & 0x3FFF) % 9000
+    amount = ((bits >> 14) & 0x1FFFFF) % 2_000_001 - 1_000_000
 
     return {
-        "id": fake.sha1(raw_output=False),
-        "time": fake.unix_time(),
-        "description": fake.sentence(),
+        "id": fake_sha1(),
+        "time": fake_unix_time(),
+        "description": "Payee",
         "mcc": mcc,
         "originalMcc": mcc,
         "hold": False,
         "amount": amount,
         "operationAmount": amount,
-        "currencyCode": random.choice((840, 980)),
+        "currencyCode": 840 if (bits >> 35) & 1 else 980,
         "commissionRate": 0,
-        "cashbackAmount": random.randint(0, 50),
+        "cashbackAmount": ((bits >> 36) & 0x3F) % 51,
         "balance": amount,
-        "counterIban": fake.iban(),
+        "counterIban": "UA000000000000000000000000000",
     }
 
 
-@register_factory
-class AccountFactory(factory.Factory):
-    class Meta:
-        model = Account
+def create_account(**kwargs) -> Account:
+    return Account(make_account(), **kwargs)
 
-    json_data = factory.LazyAttribute(make_account)
 
+def create_statement(account: Account = None, **kwargs) -> StatementItem:
+    return StatementItem(
+        make_statement(), account=account or create_account(), **kwargs
+    )
 
-@register_factory
-class StatementFactory(factory.Factory):
-    class Meta:
-        model = StatementItem
 
-    account = factory.LazyAttribute(lambda _: AccountFactory())
-    json_data = factory.LazyAttribute(make_statement)
+@pytest.fixture
+def account_factory():
+    return create_account
+
+
+@pytest.fixture
+def statement_factory():
+    return create_statement
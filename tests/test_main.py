@@ -1,16 +1,36 @@
-import re
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
 import pytest
 
+# Output tests only need a stable point in time, not the current one
+NOW = datetime.fromtimestamp(1_700_000_000)
+
+
+def parse_transactions(output):
+    # Lines of each output block with padding collapsed to single spaces
+    return {
+        tuple(" ".join(line.split()) for line in block.split("\n"))
+        for block in output.split("\n\n")
+    }
+
+
+def assert_transaction(stdout, payee, to_posting, from_account):
+    assert (
+        f"{NOW:%Y/%m/%d} {payee}",
+        to_posting,
+        from_account,
+    ) in parse_transactions(stdout)
+
 
 def assert_transaction_by_id(stdout, statement, account, amount_str):
-    regex = re.compile(
-        f"\n[0-9]{{,4}}[-|/][0-9]{{,2}}[-|/][0-9]{{,2}} .*\n"
-        f"\tAssets:Mono2ledger:{account.id} +{amount_str}\n"
-        f"\tExpenses:Mono2ledger:{account.id}:{statement.id}\n"
+    assert_transaction(
+        stdout,
+        statement.description,
+        f"Assets:Mono2ledger:{account.id} {amount_str}",
+        f"Expenses:Mono2ledger:{account.id}:{statement.id}",
     )
-    assert regex.search(stdout)
 
 
 def test_ledger_account_required_without_config(config, main, caplog):
@@ -22,16 +42,46 @@ def test_ledger_account_required_without_config(config, main, caplog):
     ) in caplog.text
 
 
+def test_config_loaded_from_xdg_config_home(tmp_path, monkeypatch):
+    from mono2ledger.main import get_config
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    ledger = tmp_path / ".local/share/ledger/journal.ledger"
+    ledger.parent.mkdir(parents=True)
+    ledger.touch()
+
+    get_config.cache_clear()
+    try:
+        with pytest.raises(SystemExit):
+            get_config()
+
+        config_file = tmp_path / "config/mono2ledger/config.yaml"
+        config_file.parent.mkdir(parents=True)
+        example = Path(__file__).parents[1] / "doc/config.example.yaml"
+        config_file.write_bytes(example.read_bytes())
+        get_config.cache_clear()
+        config = get_config()
+    finally:
+        get_config.cache_clear()
+
+    assert config.settings.ledger_file == ledger
+    assert config.settings.transfer_payee == "Withdraw"
+    assert config.accounts["shahquai5wiveiro3oReine"].ledger_account == (
+        "Assets:Mono:Black"
+    )
+    assert config.matchers[0].submatchers[0].predicate.description.match("Нива3")
+
+
 def test_statement_with_exchange(
     capsys, config, main, fetcher, ledger_file, account_factory, statement_factory
 ):
-    now = datetime.now()
-    last_transaction_date = now.date() - timedelta(days=1)
+    last_transaction_date = NOW.date() - timedelta(days=1)
     account = account_factory(currencyCode=980)
     statement = statement_factory(
         account=account,
         currencyCode=840,  # USD
-        time=now.timestamp(),
+        time=NOW.timestamp(),
         amount=1000,
         operationAmount=100,
     )
@@ -44,3 +94,241 @@ def test_statement_with_exchange(
     assert_transaction_by_id(
         capsys.readouterr().out, statement, account, "10.00 UAH @@ 1.00 USD"
     )
+
+
+def test_statement_matched_by_submatcher(
+    capsys, config, main, fetcher, ledger_file, account_factory, statement_factory
+):
+    account = account_factory()
+    statement = statement_factory(
+        account=account,
+        mcc=5411,
+        description="NIVA27",
+        time=NOW.timestamp(),
+        amount=-1000,
+        operationAmount=-1000,
+        currencyCode=980,
+    )
+    matchers = [
+        {
+            "value": {"ledger_account": "Expenses:Groceries"},
+            "predicate": {"mcc": [5411]},
+            "submatchers": [
+                {
+                    "value": {"payee": "Niva"},
+                    "predicate": {"description": "(NIVA|Нива)(27|24|3)?"},
+                }
+            ],
+        }
+    ]
+    with (
+        config({"settings": {"ledger_file": ledger_file()}, "matchers": matchers}),
+        fetcher(accounts=[account], statements=[statement]),
+    ):
+        main()
+
+    assert_transaction(
+        capsys.readouterr().out,
+        "Niva",
+        "Expenses:Groceries 10.00 UAH",
+        f"Assets:Mono2ledger:{account.id}",
+    )
+
+
+def test_fetch_statements_for_each_account(account_factory):
+    from mono2ledger.main import fetch_statements
+
+    accounts = [account_factory(), account_factory()]
+
+    def fetch(endpoint):
+        account_id = endpoint.split("/")[3]
+        return [{"id": f"{account_id}-statement"}]
+
+    now = datetime.now()
+    with (
+        mock.patch("mono2ledger.main.fetch", side_effect=fetch),
+        mock.patch("mono2ledger.main.STATEMENT_REQUEST_INTERVAL", 0),
+    ):
+        statements = fetch_statements(
+            accounts, now - timedelta(days=10), now, use_cache=False
+        )
+
+    assert sorted((x.id, x.account.id) for x in statements) == sorted(
+        (f"{x.id}-statement", x.id) for x in accounts
+    )
+
+
+def test_fetch_statements_caches_past_intervals(tmp_path, monkeypatch, account_factory):
+    from mono2ledger.main import fetch_statements
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    account = account_factory()
+    to_time = datetime.now() - timedelta(days=2)
+    from_time = to_time - timedelta(days=10)
+    with (
+        mock.patch("mono2ledger.main.fetch", return_value=[{"id": "foo"}]) as fetch,
+        mock.patch("mono2ledger.main.STATEMENT_REQUEST_INTERVAL", 0),
+    ):
+        fetch_statements([account], from_time, to_time)
+        statements = fetch_statements([account], from_time, to_time)
+
+    fetch.assert_called_once()
+    assert [x.id for x in statements] == ["foo"]
+
+
+@pytest.mark.parametrize(
+    "args, nocache, fetch_count",
+    [([], None, 1), ([], "0", 1), (["--no-cache"], None, 2), ([], "1", 2)],
+)
+def test_statement_cache_can_be_disabled(
+    args, nocache, fetch_count, tmp_path, monkeypatch, config, main, account_factory
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    if nocache is None:
+        monkeypatch.delenv("MONO2LEDGER_NOCACHE", raising=False)
+    else:
+        monkeypatch.setenv("MONO2LEDGER_NOCACHE", nocache)
+    account = account_factory()
+    # First period of statements ends long enough ago to be read from cache
+    from_time = datetime.combine(datetime.now().date() - timedelta(days=40), time())
+    to_time = from_time + timedelta(days=31)
+    ledger = tmp_path / "journal.ledger"
+    ledger.write_text(
+        f"{from_time:%Y/%m/%d} Payee\n\tExpenses:Foo  1 UAH\n\tAssets:Bar\n"
+    )
+    cache_file = tmp_path.joinpath(
+        "mono2ledger/statements",
+        account.id,
+        f"{int(from_time.timestamp())}-{int(to_time.timestamp())}.json",
+    )
+    cache_file.parent.mkdir(parents=True)
+    cache_file.write_text("[]")
+
+    with (
+        config({}),
+        mock.patch("mono2ledger.main.fetch_accounts", return_value=[account]),
+        mock.patch("mono2ledger.main.fetch", return_value=[]) as fetch,
+        mock.patch("mono2ledger.main.STATEMENT_REQUEST_INTERVAL", 0),
+    ):
+        main([str(ledger), *args])
+
+    assert fetch.call_count == fetch_count
+
+
+def test_last_transaction_date_skips_comments(config, tmp_path):
+    from mono2ledger.main import get_last_transaction_date
+
+    ledger = tmp_path / "journal.ledger"
+    content = (
+        "2023/01/01 Payee\n\tExpenses:Foo  100 UAH\n\tAssets:Bar\n\n"
+        "comment\n2023/02/01 Payee\nend comment\n"
+        "; 2023/03/01 Payee\n"
+        "2023/01/15 Payee\n\tExpenses:Foo  100 UAH\n\tAssets:Bar\n\n"
+        "comment\n2023/04/01 Payee\n"
+    )
+    with config({}):
+        for newline in ("\n", "\r\n"):
+            ledger.write_bytes(content.replace("\n", newline).encode())
+            assert get_last_transaction_date(str(ledger)) == datetime(2023, 1, 15)
+
+
+def test_cross_card_statements_merged_into_transfer(
+    capsys, config, main, fetcher, ledger_file, account_factory, statement_factory
+):
+    source, destination = account_factory(), account_factory()
+    common = {
+        "time": NOW.timestamp(),
+        "mcc": 4829,
+        "currencyCode": 980,
+        "cashbackAmount": 0,
+    }
+    statements = [
+        statement_factory(
+            account=source,
+            amount=-1000,
+            operationAmount=-1000,
+            counterIban=destination.iban,
+            **common,
+        ),
+        statement_factory(
+            account=destination,
+            amount=1000,
+            operationAmount=1000,
+            counterIban=source.iban,
+            **common,
+        ),
+    ]
+    with (
+        config({"settings": {"ledger_file": ledger_file()}}),
+        fetcher(accounts=[source, destination], statements=statements),
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert out.count(" Transfer\n") == 1
+    assert_transaction(
+        out,
+        "Transfer",
+        f"Assets:Mono2ledger:{destination.id} 10.00 UAH",
+        f"Assets:Mono2ledger:{source.id}",
+    )
+
+
+def test_date_range_splits_period():
+    from mono2ledger.main import date_range
+
+    start = datetime(2023, 1, 1)
+    end = datetime(2023, 3, 1)
+    assert list(date_range(start, end, timedelta(days=31))) == [
+        (datetime(2023, 1, 1), datetime(2023, 2, 1)),
+        (datetime(2023, 2, 1, 0, 0, 1), datetime(2023, 3, 1)),
+    ]
+    assert list(date_range(start, start + timedelta(days=1), timedelta(days=31))) == [
+        (start, start + timedelta(days=1))
+    ]
+
+
+def test_statement_on_period_boundary_fetched_once(account_factory):
+    from mono2ledger.main import STATEMENT_MAX_PERIOD, fetch_statements
+
+    from_time = datetime(2023, 1, 1)
+    boundary = int((from_time + STATEMENT_MAX_PERIOD).timestamp())
+
+    def fetch(endpoint):
+        start, end = map(int, endpoint.split("/")[4:])
+        return [{"id": "x", "time": boundary}] if start <= boundary <= end else []
+
+    with (
+        mock.patch("mono2ledger.main.fetch", side_effect=fetch) as fetch_mock,
+        mock.patch("mono2ledger.main.STATEMENT_REQUEST_INTERVAL", 0),
+    ):
+        statements = fetch_statements(
+            [account_factory()],
+            from_time,
+            from_time + timedelta(days=40),
+            use_cache=False,
+        )
+
+    assert fetch_mock.call_count == 2
+    assert [x.id for x in statements] == ["x"]
+
+
+def test_fetch_statements_splits_full_response(account_factory):
+    from mono2ledger.main import fetch_statements
+
+    def fetch(endpoint):
+        from_time, to_time = map(int, endpoint.split("/")[4:])
+        days = (to_time - from_time) // (24 * 60 * 60)
+        return [{"id": f"{from_time}-{x}"} for x in range(500 if days > 5 else 1)]
+
+    now = datetime.now()
+    with (
+        mock.patch("mono2ledger.main.fetch", side_effect=fetch) as fetch_mock,
+        mock.patch("mono2ledger.main.STATEMENT_REQUEST_INTERVAL", 0),
+    ):
+        statements = fetch_statements(
+            [account_factory()], now - timedelta(days=8), now, use_cache=False
+        )
+
+    assert fetch_mock.call_count == 3
+    assert len(statements) == 2